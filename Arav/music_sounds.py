@@ -1,8 +1,10 @@
+import ctypes
+import sys
 import mido
+import threading
 import time
-import keyboard
 import tkinter as tk
-from typing import Dict, List
+from typing import Dict
 
 # Define instrument mappings (General MIDI program numbers)
 INSTRUMENTS = {
@@ -15,13 +17,14 @@ INSTRUMENTS = {
 }
 
 # Define note mappings for different instruments
-NOTE_RANGES: Dict[int, List[int]] = {
-    1: list(range(21, 109)),  # Piano (full range)
-    5: list(range(28, 103)),  # Electric Piano
-    25: list(range(40, 84)),  # Acoustic Guitar
-    41: list(range(55, 100)), # Violin
-    57: list(range(55, 82)),  # Trumpet
-    74: list(range(60, 96))   # Flute
+# Stored as range objects: membership tests are O(1) and no list is built
+NOTE_RANGES: Dict[int, range] = {
+    1: range(21, 109),  # Piano (full range)
+    5: range(28, 103),  # Electric Piano
+    25: range(40, 84),  # Acoustic Guitar
+    41: range(55, 100), # Violin
+    57: range(55, 82),  # Trumpet
+    74: range(60, 96)   # Flute
 }
 
 # Define notes for the visual interface
@@ -41,14 +44,59 @@ VISUAL_NOTES = [
     {'note': 72, 'name': 'C5', 'color': 'white'}
 ]
 
+# Notes drawn as white keys, for picking the highlight color
+WHITE_NOTES = frozenset(n['note'] for n in VISUAL_NOTES if n['color'] == 'white')
+
+# Computer keyboard layout for the visual interface (piano-style home row)
+KEY_NOTES: Dict[str, int] = {
+    'a': 60, 'w': 61, 's': 62, 'e': 63, 'd': 64, 'f': 65, 't': 66,
+    'g': 67, 'y': 68, 'h': 69, 'u': 70, 'j': 71, 'k': 72
+}
+
+# On Windows we poll the OS key state directly instead of waiting for
+# queued key events, so keys pressed together register together
+if sys.platform == "win32":
+    _user32 = ctypes.windll.user32
+    
+    def _os_key_down(key: str) -> bool:
+        """Whether a letter key is currently held (virtual-key code == uppercase ASCII)"""
+        return bool(_user32.GetAsyncKeyState(ord(key.upper())) & 0x8000)
+else:
+    _os_key_down = None
+
+def _precise_sleep(seconds: float, stop: threading.Event) -> bool:
+    """
+    Wait on stop for most of the interval, then spin for the last ~2 ms to
+    hit it exactly. Returns True as soon as stop is set, False on time.
+    """
+    end = time.perf_counter() + seconds
+    if stop.wait(max(0.0, seconds - 0.002)):
+        return True
+    while time.perf_counter() < end:
+        pass
+    return False
+
 class MusicInstrument:
     def __init__(self):
         self.port = mido.open_output()
         self.current_instrument = 1  # Default to piano
+        # Cached per-instrument lookups, refreshed in select_instrument
+        self._current_range = NOTE_RANGES[self.current_instrument]
+        self._current_name = INSTRUMENTS[self.current_instrument]
         self.active_notes = {}  # Dictionary to store active notes and their start times
         self.current_note = None
         self.start_time = None
+        # Reusable note messages; we only change .note/.velocity before sending
+        self._on = mido.Message('note_on', note=0, velocity=64)
+        self._off = mido.Message('note_off', note=0, velocity=0)
+        self._scale_thread = None  # Background thread playing a scale, if any
+        self._scale_stop = threading.Event()
         
+    @property
+    def current_name(self) -> str:
+        """Name of the selected instrument"""
+        return self._current_name
+    
     def select_instrument(self):
         """Display and select an instrument"""
         print("\nAvailable Instruments:")
@@ -59,10 +107,12 @@ class MusicInstrument:
             num = int(input("\nSelect instrument number: "))
             if num in INSTRUMENTS:
                 self.current_instrument = num
+                self._current_range = NOTE_RANGES[num]
+                self._current_name = INSTRUMENTS[num]
                 # Send program change message to change instrument
                 program_change = mido.Message('program_change', program=num-1)
                 self.port.send(program_change)
-                print(f"\nSelected instrument: {INSTRUMENTS[num]}")
+                print(f"\nSelected instrument: {self._current_name}")
                 return True
             else:
                 print("Invalid instrument number")
@@ -73,50 +123,100 @@ class MusicInstrument:
     
     def start_note(self, note: int):
         """Start playing a note"""
-        if note in NOTE_RANGES[self.current_instrument]:
+        if note in self._current_range:
             if self.current_note != note:
                 if self.current_note is not None:
                     self.stop_note()
                 
                 self.current_note = note
-                self.start_time = time.time()
+                self.start_time = time.perf_counter()
                 # Start with medium velocity
-                note_on = mido.Message('note_on', note=note, velocity=64)
-                self.port.send(note_on)
+                self._on.note = note
+                self._on.velocity = 64
+                self.port.send(self._on)
         else:
-            print(f"Note {note} is out of range for {INSTRUMENTS[self.current_instrument]}")
+            print(f"Note {note} is out of range for {self._current_name}")
     
     def stop_note(self):
         """Stop playing the current note"""
         if self.current_note is not None:
-            duration = time.time() - self.start_time
+            duration = time.perf_counter() - self.start_time
             # Calculate velocity based on duration (longer press = stronger velocity)
             velocity = min(127, int(64 + (duration * 30)))
             
             # Send note off
-            note_off = mido.Message('note_off', note=self.current_note, velocity=velocity)
-            self.port.send(note_off)
+            self._off.note = self.current_note
+            self._off.velocity = velocity
+            self.port.send(self._off)
             
             self.current_note = None
             self.start_time = None
     
     def play_scale(self, start_note: int, scale_type: str = "major"):
-        """Play a scale starting from the given note"""
+        """Play a scale starting from the given note, without blocking the caller"""
         major_scale = [0, 2, 4, 5, 7, 9, 11, 12]
         minor_scale = [0, 2, 3, 5, 7, 8, 10, 12]
+        note_length = 0.5
         
         scale = major_scale if scale_type.lower() == "major" else minor_scale
         print(f"\nPlaying {scale_type} scale from note {start_note}")
-        for interval in scale:
+        
+        # Build every message up front with an absolute deadline so the
+        # scheduler thread only has to wait and send
+        self._stop_scale()
+        start = time.perf_counter()
+        off_velocity = min(127, int(64 + (note_length * 30)))
+        events = []
+        for i, interval in enumerate(scale):
             note = start_note + interval
-            self.start_note(note)
-            time.sleep(0.5)
-            self.stop_note()
+            if note not in self._current_range:
+                print(f"Note {note} is out of range for {self._current_name}")
+                continue
+            # Off time is computed the same way as the next note's on time,
+            # so the two are exactly equal
+            t_on = start + i * note_length
+            t_off = start + (i + 1) * note_length
+            events.append((t_on, mido.Message('note_on', note=note, velocity=64)))
+            events.append((t_off, mido.Message('note_off', note=note, velocity=off_velocity)))
+        # Stable sort then keeps each note_off ahead of the next note_on
+        events.sort(key=lambda event: event[0])
+        
+        self._scale_stop = threading.Event()
+        self._scale_thread = threading.Thread(
+            target=self._run_events, args=(events, self._scale_stop), daemon=True
+        )
+        self._scale_thread.start()
+    
+    def _run_events(self, events, stop: threading.Event):
+        """Send each (deadline, message) pair once its deadline is reached"""
+        sounding = set()
+        for i, (deadline, message) in enumerate(events):
+            # Waiting on the stop event means a stop is noticed immediately
+            if _precise_sleep(deadline - time.perf_counter(), stop):
+                # Don't leave anything ringing that we actually started
+                for _, pending in events[i:]:
+                    if pending.type == 'note_off' and pending.note in sounding:
+                        self.port.send(pending)
+                        sounding.discard(pending.note)
+                return
+            
+            self.port.send(message)
+            if message.type == 'note_on':
+                sounding.add(message.note)
+            else:
+                sounding.discard(message.note)
+    
+    def _stop_scale(self):
+        """Stop a scale that is still playing and wait for its thread to exit"""
+        if self._scale_thread is not None:
+            self._scale_stop.set()
+            self._scale_thread.join()
+            self._scale_thread = None
     
     def visual_play_mode(self):
         """Create a visual interface for playing notes"""
         root = tk.Tk()
-        root.title(f"Musical Interface - {INSTRUMENTS[self.current_instrument]}")
+        root.title(f"Musical Interface - {self._current_name}")
         
         # Set window size and position
         window_width = 800
@@ -137,121 +237,209 @@ class MusicInstrument:
         black_key_width = white_key_width * 0.6
         black_key_height = white_key_height * 0.6
         
+        # Precompute the (x1, x2, note, name) span of every key. Both drawing
+        # and hit-testing read these, so the two can't disagree, and hit-testing
+        # a mouse event is a short scan over tuples
+        key_top = window_height - white_key_height
+        black_key_bottom = key_top + black_key_height
+        white_hits = []
+        black_hits = []
+        white_x = 0
+        for i, note in enumerate(VISUAL_NOTES):
+            if note['color'] == 'white':
+                white_hits.append((white_x, white_x + white_key_width, note['note'], note['name']))
+                if i + 1 < len(VISUAL_NOTES) and VISUAL_NOTES[i+1]['color'] == 'black':
+                    black_hits.append((
+                        white_x + white_key_width - black_key_width/2,
+                        white_x + white_key_width + black_key_width/2,
+                        VISUAL_NOTES[i+1]['note'],
+                        VISUAL_NOTES[i+1]['name']
+                    ))
+                white_x += white_key_width
+        
         def draw_piano():
             """Draw the piano keys"""
             # Draw white keys
-            white_x = 0
-            white_index = 0
-            for note in VISUAL_NOTES:
-                if note['color'] == 'white':
-                    canvas.create_rectangle(
-                        white_x, window_height - white_key_height,
-                        white_x + white_key_width, window_height,
-                        fill='white', outline='black', tags=f"key_{note['note']}"
-                    )
-                    # Add note name
-                    canvas.create_text(
-                        white_x + white_key_width/2,
-                        window_height - 20,
-                        text=note['name'],
-                        font=('Arial', 10)
-                    )
-                    white_x += white_key_width
-                    white_index += 1
+            for x1, x2, note, name in white_hits:
+                canvas.create_rectangle(
+                    x1, key_top, x2, window_height,
+                    fill='white', outline='black', tags=f"key_{note}"
+                )
+                # Add note name
+                canvas.create_text(
+                    (x1 + x2) / 2,
+                    window_height - 20,
+                    text=name,
+                    font=('Arial', 10)
+                )
             
             # Draw black keys
-            white_x = 0
-            for i, note in enumerate(VISUAL_NOTES[:-1]):  # Exclude last note
-                if note['color'] == 'white' and VISUAL_NOTES[i+1]['color'] == 'black':
-                    canvas.create_rectangle(
-                        white_x + white_key_width - black_key_width/2,
-                        window_height - white_key_height,
-                        white_x + white_key_width + black_key_width/2,
-                        window_height - white_key_height + black_key_height,
-                        fill='black', tags=f"key_{VISUAL_NOTES[i+1]['note']}"
-                    )
-                    # Add note name in white
-                    canvas.create_text(
-                        white_x + white_key_width,
-                        window_height - white_key_height + black_key_height/2,
-                        text=VISUAL_NOTES[i+1]['name'],
-                        fill='white',
-                        font=('Arial', 8)
-                    )
-                    white_x += white_key_width
-                elif note['color'] == 'white':
-                    white_x += white_key_width
-        
-        def get_note_from_position(event):
+            for x1, x2, note, name in black_hits:
+                canvas.create_rectangle(
+                    x1, key_top, x2, black_key_bottom,
+                    fill='black', tags=f"key_{note}"
+                )
+                # Add note name in white
+                canvas.create_text(
+                    (x1 + x2) / 2,
+                    key_top + black_key_height/2,
+                    text=name,
+                    fill='white',
+                    font=('Arial', 8)
+                )
+        
+        def get_note_from_position(x, y):
             """Determine which note to play based on mouse position"""
-            x, y = event.x, event.y
             
             # Check if clicking black keys first (they're on top)
-            white_x = 0
-            for i, note in enumerate(VISUAL_NOTES[:-1]):
-                if note['color'] == 'white' and VISUAL_NOTES[i+1]['color'] == 'black':
-                    black_key_x1 = white_x + white_key_width - black_key_width/2
-                    black_key_x2 = white_x + white_key_width + black_key_width/2
-                    black_key_y = window_height - white_key_height + black_key_height
-                    
-                    if (black_key_x1 <= x <= black_key_x2 and 
-                        window_height - white_key_height <= y <= black_key_y):
-                        return VISUAL_NOTES[i+1]['note']
-                    white_x += white_key_width
-                elif note['color'] == 'white':
-                    white_x += white_key_width
+            if key_top <= y <= black_key_bottom:
+                for x1, x2, note, _ in black_hits:
+                    if x1 <= x <= x2:
+                        return note
             
             # Check white keys
-            white_x = 0
-            for note in VISUAL_NOTES:
-                if note['color'] == 'white':
-                    if (white_x <= x <= white_x + white_key_width and 
-                        window_height - white_key_height <= y <= window_height):
-                        return note['note']
-                    white_x += white_key_width
+            if key_top <= y <= window_height:
+                for x1, x2, note, _ in white_hits:
+                    if x1 <= x <= x2:
+                        return note
             
             return None
         
+        # Redraws are batched: handlers only record the fill a key should
+        # have, and tick() applies it at most once per key per frame
+        key_fill = {}
+        dirty_keys = set()
+        
+        def set_highlight(note, on):
+            """Queue a key to be drawn pressed (on) or in its normal color"""
+            if on:
+                key_fill[note] = 'lightblue' if note in WHITE_NOTES else 'gray'
+            else:
+                key_fill[note] = 'white' if note in WHITE_NOTES else 'black'
+            dirty_keys.add(note)
+        
+        # Mouse state for this window: the key last played by the mouse, and
+        # the newest drag position not yet handled by tick()
+        last_hit = None
+        pending_drag = None
+        
         def on_mouse_press(event):
-            note = get_note_from_position(event)
+            nonlocal last_hit, pending_drag
+            pending_drag = None
+            note = get_note_from_position(event.x, event.y)
+            last_hit = note
             if note is not None:
                 self.start_note(note)
                 # Highlight the key
-                canvas.itemconfig(f"key_{note}", fill='lightblue' if note in [n['note'] for n in VISUAL_NOTES if n['color'] == 'white'] else 'gray')
+                set_highlight(note, True)
         
         def on_mouse_motion(event):
-            note = get_note_from_position(event)
-            if note is not None:
-                self.start_note(note)
-                # Highlight the key
-                canvas.itemconfig(f"key_{note}", fill='lightblue' if note in [n['note'] for n in VISUAL_NOTES if n['color'] == 'white'] else 'gray')
+            # Drag events fire for every pixel; just remember the latest
+            # position and let tick() handle it, at most once per tick
+            nonlocal pending_drag
+            pending_drag = (event.x, event.y)
+        
+        def handle_drag():
+            """Play the key under the newest drag position, if it changed"""
+            nonlocal last_hit, pending_drag
+            if pending_drag is None:
+                return
+            note = get_note_from_position(*pending_drag)
+            pending_drag = None
+            # Nothing to do while the mouse stays on the same key
+            if note is None or note == last_hit:
+                return
+            last_hit = note
+            self.start_note(note)
+            # Highlight the key
+            set_highlight(note, True)
         
         def on_mouse_release(event):
-            self.stop_note()
-            # Reset all key colors
+            nonlocal last_hit, pending_drag
+            # Only stop the note if the mouse is what started it; a key held
+            # on the computer keyboard keeps sounding
+            if last_hit is not None and self.current_note == last_hit:
+                self.stop_note()
+            last_hit = None
+            pending_drag = None
+            # Reset key colors, except for keys still held on the keyboard
+            held_notes = {KEY_NOTES[key] for key in keys_down}
             for note in VISUAL_NOTES:
-                canvas.itemconfig(f"key_{note['note']}", fill=note['color'])
+                if note['note'] not in held_notes:
+                    set_highlight(note['note'], False)
+        
+        # Keys currently seen as held; fed by Tk key events where we
+        # can't poll the OS
+        keys_down = set()
+        tk_keys_down = set()
+        if _os_key_down is not None:
+            key_down = _os_key_down
+        else:
+            root.bind('<KeyPress>', lambda event: tk_keys_down.add(event.keysym.lower()))
+            root.bind('<KeyRelease>', lambda event: tk_keys_down.discard(event.keysym.lower()))
+            # Releases in another window never reach us, so forget every key
+            # when focus leaves rather than replaying it when focus returns
+            root.bind('<FocusOut>', lambda event: tk_keys_down.clear())
+            key_down = tk_keys_down.__contains__
+        
+        def poll_keys():
+            """Turn key down/up transitions into note starts/stops"""
+            # GetAsyncKeyState is global, so ignore keys while we're not focused
+            focused = root.focus_displayof() is not None
+            for key, note in KEY_NOTES.items():
+                down = focused and key_down(key)
+                if down and key not in keys_down:
+                    keys_down.add(key)
+                    self.start_note(note)
+                    set_highlight(note, True)
+                elif not down and key in keys_down:
+                    keys_down.discard(key)
+                    if self.current_note == note:
+                        self.stop_note()
+                    set_highlight(note, False)
+        
+        def tick():
+            """Fixed ~200 Hz UI update: poll input, then redraw changed keys"""
+            handle_drag()
+            poll_keys()
+            for note in dirty_keys:
+                canvas.itemconfig(f"key_{note}", fill=key_fill[note])
+            dirty_keys.clear()
+            root.after(5, tick)
         
         # Draw the piano
         draw_piano()
+        print("\nPlay with the mouse, or with keys A-K (W E T Y U for sharps)")
         
         # Bind mouse events
         canvas.bind('<Button-1>', on_mouse_press)
         canvas.bind('<B1-Motion>', on_mouse_motion)
         canvas.bind('<ButtonRelease-1>', on_mouse_release)
         
+        def close_window():
+            """Silence any note still held before leaving the window"""
+            self.stop_note()
+            root.destroy()
+        
         # Add quit button
-        quit_button = tk.Button(root, text="Back to Menu", command=root.destroy)
+        quit_button = tk.Button(root, text="Back to Menu", command=close_window)
         quit_button.pack(pady=10)
         
+        root.protocol('WM_DELETE_WINDOW', close_window)
+        root.after(5, tick)
         root.mainloop()
     
     def close(self):
         """Close the MIDI port"""
+        self._stop_scale()
         self.stop_note()
         self.port.close()
 
 def main():
+    # Ask Windows for 1 ms timer resolution so sleeps don't overshoot by ~15 ms
+    if sys.platform == "win32":
+        ctypes.windll.winmm.timeBeginPeriod(1)
+    
     instrument = MusicInstrument()
     print("\nWelcome to the Musical Instrument Interface!")
     
@@ -261,7 +449,7 @@ def main():
     
     while True:
         print("\n=== Musical Instrument Interface ===")
-        print(f"Current Instrument: {INSTRUMENTS[instrument.current_instrument]}")
+        print(f"Current Instrument: {instrument.current_name}")
         print("\nOptions:")
         print("1. Change Instrument")
         print("2. Visual Play Mode")
@@ -293,6 +481,8 @@ def main():
         
         elif choice == "4":
             instrument.close()
+            if sys.platform == "win32":
+                ctypes.windll.winmm.timeEndPeriod(1)
             print("Thank you for making music! Goodbye!")
             break
         
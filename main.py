@@ -1,17 +1,47 @@
+import ctypes
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 import sounddevice as sd
 
+from synth import mix, warm_up
+
 #####################
 # Audio Configuration
 #####################
 
-SAMPLE_RATE = 96000 # Standard audio sampling rate
-volume = 0.3         # Default volume
+# Both are set in main() from the output device's native rate, so
+# nothing gets resampled (and importing this module needs no audio device)
+SAMPLE_RATE = None
+RAD_PER_SAMPLE = None  # Phase step per sample for 1 Hz
+MAX_VOICES = 4       # Largest chord we ever play (fist → 4 notes)
+
+# Handoff to the audio thread. The main thread is the only writer and the
+# callback the only reader, so no lock is needed:
+#  - _increments_slot[0] holds the per-sample rotation exp(i*2*pi*f/SR) for
+#    each active voice. The main thread always builds a *fresh* array and
+#    swaps it in with a single list store (atomic in CPython), so the callback
+#    never sees a half-written set. The voice count is the array's size, which
+#    keeps count and data from tearing apart.
+#  - _volume is a plain C float, read without touching any Python container.
+_increments_slot = [np.zeros(0, dtype=np.complex64)]
+_volume = ctypes.c_float(0.3)  # Default volume
+
+
+def set_active_frequencies(freqs):
+    """
+    Replace the set of active frequencies and publish the per-voice
+    phasor increments to the audio callback.
+    """
+    omega = RAD_PER_SAMPLE * np.asarray(freqs[:MAX_VOICES], dtype=np.float64)
+    _increments_slot[0] = np.exp(1j * omega).astype(np.complex64)
 
-# We'll keep a list of active frequencies instead of a single freq
-active_frequencies = []
+
+def set_volume(vol):
+    """Publish a new output volume to the audio callback."""
+    _volume.value = vol
 
 ##############################
 # Sounddevice Audio Callback
@@ -19,26 +49,17 @@ active_frequencies = []
 def audio_callback(outdata, frames, time_info, status):
     """
     This callback is called by sounddevice for each audio block.
-    We'll sum up sine waves for all active frequencies.
+    Each voice is a unit phasor z = exp(i*phi) that we rotate by its
+    increment once per sample; the imaginary part is the sine wave.
+    Phase carries over between blocks (and across frequency changes),
+    and voices ramp in and out, so note changes don't click.
     """
-    global active_frequencies, volume
-
-    # Generate time values for this chunk
-    t = (np.arange(frames) + audio_callback.t0) / SAMPLE_RATE
-
-    # Start with silence
-    mix = np.zeros(frames, dtype=np.float32)
+    mix(outdata[:, 0], audio_callback.phasors, audio_callback.incs,
+        audio_callback.amps, _increments_slot[0], _volume.value, frames)
 
-    # Sum a sine wave for each active frequency
-    for freq in active_frequencies:
-        mix += volume * np.sin(2 * np.pi * freq * t).astype(np.float32)
-
-    outdata[:] = mix.reshape(-1, 1)  # mono sound
-
-    # Update t0 so next block continues where we left off
-    audio_callback.t0 += frames
-
-audio_callback.t0 = 0  # phase accumulator
+audio_callback.phasors = np.ones(MAX_VOICES, dtype=np.complex64)  # z_j per voice
+audio_callback.incs = np.ones(MAX_VOICES, dtype=np.complex64)     # w_j per voice
+audio_callback.amps = np.zeros(MAX_VOICES, dtype=np.float32)      # envelope per voice
 
 ###########################
 # Mediapipe Setup
@@ -46,6 +67,10 @@ audio_callback.t0 = 0  # phase accumulator
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
+INFERENCE_EVERY = 2    # Run hand detection on every Nth webcam frame
+INFERENCE_WIDTH = 320  # Downscale frames to this width before detection
+DISPLAY_INTERVAL = 1 / 30  # Refresh the preview window at most 30 times a second
+
 
 def count_extended_fingers(hand_landmarks):
     """
@@ -72,16 +97,50 @@ def count_extended_fingers(hand_landmarks):
     return extended_count
 
 
+def build_grid_overlay(frame_height, frame_width, grid_rows=10, grid_cols=10):
+    """
+    Draw the XY grid once onto a blank image. Returns the image and a
+    (h, w, 1) mask of the grid pixels for np.copyto(..., where=mask).
+    """
+    overlay = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
+    row_step = frame_height // grid_rows
+    col_step = frame_width // grid_cols
+
+    for r in range(1, grid_rows):
+        y = r * row_step
+        cv2.line(overlay, (0, y), (frame_width, y), (0, 255, 0), 1)
+    for c in range(1, grid_cols):
+        x = c * col_step
+        cv2.line(overlay, (x, 0), (x, frame_height), (0, 255, 0), 1)
+
+    mask = overlay.any(axis=2, keepdims=True)
+    return overlay, mask
+
+
 def main():
-    global active_frequencies, volume
+    global SAMPLE_RATE, RAD_PER_SAMPLE
+
+    # Run at the output device's native rate
+    SAMPLE_RATE = int(sd.query_devices(kind='output')['default_samplerate'])
+    RAD_PER_SAMPLE = 2 * np.pi / SAMPLE_RATE
 
     # Open webcam
     cap = cv2.VideoCapture(0)
+    # Don't let frames queue up in the driver; always read the latest one
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # Compile the mixer now so the first audio block doesn't pay for it
+    warm_up()
 
     # Start audio stream
+    # Small blocks keep latency low; the callback allocates nothing, so it
+    # can keep up with being called this often
     stream = sd.OutputStream(
         samplerate=SAMPLE_RATE,
         channels=1,
+        blocksize=128,
+        latency='low',
+        dtype='float32',
         callback=audio_callback
     )
     stream.start()
@@ -94,6 +153,12 @@ def main():
         min_tracking_confidence=0.3
     )
 
+    frame_idx = 0
+    last_landmarks = None  # Reused on frames we skip detection for
+    small = frame_rgb = None  # Downscaled BGR / RGB scratch images
+    grid_overlay = grid_mask = None
+    last_show = 0.0
+
     try:
         while True:
             ret, frame = cap.read()
@@ -104,26 +169,40 @@ def main():
             # Draw an XY grid on the frame
             frame_height, frame_width, _ = frame.shape
 
-            # For example, draw a 4x4 grid
-            grid_rows = 10
-            grid_cols = 10
-            row_step = frame_height // grid_rows
-            col_step = frame_width // grid_cols
-
-            for r in range(1, grid_rows):
-                y = r * row_step
-                cv2.line(frame, (0, y), (frame_width, y), (0, 255, 0), 1)
-            for c in range(1, grid_cols):
-                x = c * col_step
-                cv2.line(frame, (x, 0), (x, frame_height), (0, 255, 0), 1)
-
-            # Convert the frame to RGB (Mediapipe uses RGB)
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hand_detector.process(frame_rgb)
+            # The grid only depends on the frame size, so render it once
+            # and stamp it onto each frame with a single masked copy
+            if grid_overlay is None or grid_overlay.shape != frame.shape:
+                grid_overlay, grid_mask = build_grid_overlay(frame_height, frame_width)
+            np.copyto(frame, grid_overlay, where=grid_mask)
+
+            # Only detect hands every few frames, on a downscaled copy.
+            # Landmarks are normalized to [0,1] so they still line up with
+            # the full-size frame we draw on.
+            if frame_idx % INFERENCE_EVERY == 0:
+                inference_height = frame_height * INFERENCE_WIDTH // frame_width
+
+                # Reuse the same scratch images every frame instead of
+                # allocating new ones (only reallocated if the size changes)
+                if small is None or small.shape[0] != inference_height:
+                    small = np.empty((inference_height, INFERENCE_WIDTH, 3), dtype=np.uint8)
+                    frame_rgb = np.empty_like(small)
+                cv2.resize(frame, (INFERENCE_WIDTH, inference_height),
+                           dst=small, interpolation=cv2.INTER_AREA)
+
+                # Convert the frame to RGB (Mediapipe uses RGB). Mediapipe
+                # needs a contiguous image, so a reversed-channel view won't do.
+                cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+                results = hand_detector.process(frame_rgb)
 
-            if results.multi_hand_landmarks:
                 # We only look at the first detected hand for simplicity
-                hand_landmarks = results.multi_hand_landmarks[0]
+                if results.multi_hand_landmarks:
+                    last_landmarks = results.multi_hand_landmarks[0]
+                else:
+                    last_landmarks = None
+            frame_idx += 1
+
+            if last_landmarks is not None:
+                hand_landmarks = last_landmarks
 
                 # Draw the hand annotations
                 mp_drawing.draw_landmarks(
@@ -142,7 +221,7 @@ def main():
 
                 # Map X to volume (0.0 - 0.7)
                 vol_min, vol_max = 0.0, 0.7
-                volume = vol_min + (vol_max - vol_min) * (1.0 - x)
+                set_volume(vol_min + (vol_max - vol_min) * (1.0 - x))
 
                 # We'll map Y to a base frequency (200-800 Hz)
                 # Invert Y so that moving the hand up (y=0) is higher pitch
@@ -152,12 +231,12 @@ def main():
                 # Now decide frequencies based on how many fingers are extended
                 if extended == 1:
                     # One note
-                    active_frequencies = [base_freq]
+                    set_active_frequencies([base_freq])
 
                 elif extended == 2:
                     # Two notes: base_freq and an interval above it (e.g. perfect 5th)
                     interval_ratio = 1.5  # perfect 5th
-                    active_frequencies = [base_freq, base_freq * interval_ratio]
+                    set_active_frequencies([base_freq, base_freq * interval_ratio])
 
                 elif extended == 0:
                     # Fist → an ensemble (e.g. a major chord)
@@ -167,23 +246,27 @@ def main():
                     major_third = 1.26
                     perfect_fifth = 1.50
                     octave = 2.00
-                    active_frequencies = [
+                    set_active_frequencies([
                         base_freq,
                         base_freq * major_third,
                         base_freq * perfect_fifth,
                         base_freq * octave,
-                    ]
+                    ])
                 else:
                     # Any other case (3,4,5 fingers?), just default to a single note
-                    active_frequencies = [base_freq]
+                    set_active_frequencies([base_freq])
 
             else:
                 # No hand detected → no active frequencies (silence)
-                active_frequencies = []
-
-            # Show the webcam feed
-            cv2.imshow("Theremin with XY Grid", frame)
-            if cv2.waitKey(1) & 0xFF == 27:  # ESC key
+                set_active_frequencies([])
+
+            # Show the webcam feed, but don't spend CPU redrawing it faster
+            # than needed; pollKey still handles input without waiting
+            now = time.perf_counter()
+            if now - last_show >= DISPLAY_INTERVAL:
+                cv2.imshow("Theremin with XY Grid", frame)
+                last_show = now
+            if cv2.pollKey() & 0xFF == 27:  # ESC key
                 break
 
     except KeyboardInterrupt:
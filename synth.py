@@ -0,0 +1,58 @@
+import numpy as np
+from numba import njit
+
+#####################################
+# Phasor Mixer (shared audio kernel)
+#####################################
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def mix(out, phasors, incs, amps, new_incs, vol, frames):
+    """
+    Rotate each voice's phasor once per sample and write the summed
+    sines (the imaginary parts) into out. Compiled by Numba into one
+    tight loop with no temporaries.
+
+    The first new_incs.size voices are active and fade in to full
+    amplitude; the rest fade out at their last pitch. Each fade is a
+    linear ramp across the block, so voices coming and going never
+    cause a click. Increments beyond phasors.size are ignored.
+    """
+    # Compiled without bounds checks, so never index past our voices
+    k = min(new_incs.size, phasors.size)
+    for j in range(k):
+        incs[j] = new_incs[j]
+
+    for i in range(frames):
+        out[i] = 0.0
+
+    step = 1.0 / frames
+    for j in range(phasors.size):
+        target = 1.0 if j < k else 0.0
+        a = amps[j]
+        if a == 0.0 and target == 0.0:
+            continue  # Silent voice, nothing to add
+
+        da = (target - a) * step
+        z = phasors[j]
+        w = incs[j]
+        for i in range(frames):
+            z *= w
+            a += da
+            out[i] += a * z.imag
+
+        # Renormalize so rounding error can't make the amplitude drift
+        phasors[j] = z / abs(z)
+        amps[j] = target
+
+    for i in range(frames):
+        out[i] *= vol
+
+
+def warm_up():
+    """
+    Compile mix now (or load it from Numba's cache) so the first audio
+    block doesn't pay for it. Call before starting the output stream.
+    """
+    mix(np.zeros(1, dtype=np.float32), np.ones(1, dtype=np.complex64),
+        np.ones(1, dtype=np.complex64), np.zeros(1, dtype=np.float32),
+        np.ones(1, dtype=np.complex64), 0.0, 1)